@@ -2,6 +2,8 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from models.roles import UserRole, UserWithRole, get_user_permissions
+from dependencies.shared_state import shared_state
+from starlette.concurrency import run_in_threadpool
 import uuid
 
 security = HTTPBearer(auto_error=False)  # Don't auto-raise error if no token
@@ -34,15 +36,41 @@ mock_users_db = {
     }
 }
 
+# Version of the shared role assignments reflected in mock_users_db
+roles_version = 0
+
+async def sync_user_roles():
+    """Refresh cached roles when another worker has changed them"""
+    global roles_version
+    if shared_state is None or shared_state.version("user_roles") == roles_version:
+        return
+    version, roles = await run_in_threadpool(shared_state.snapshot, "user_roles")
+    if version > roles_version:  # A concurrent request may have loaded a newer one meanwhile
+        for uid, role in roles.items():
+            if uid in mock_users_db:
+                mock_users_db[uid]["role"] = UserRole(role)
+        roles_version = version
+
 def get_user_role(uid: str) -> UserRole:
     """Get user role from mock database"""
     user = mock_users_db.get(uid)
     return user["role"] if user else UserRole.NORMAL
 
-def set_user_role(uid: str, role: UserRole):
+async def set_user_role(uid: str, role: UserRole):
     """Set user role in mock database"""
+    global roles_version
     if uid in mock_users_db:
         mock_users_db[uid]["role"] = role
+        if shared_state is not None:
+            expected_version = roles_version
+            version = await run_in_threadpool(shared_state.save, "user_roles", uid, role.value)
+            if roles_version >= version:
+                return  # A sync meanwhile loaded a snapshot that already includes this change
+            # A sync meanwhile may have loaded a snapshot from before this change - re-apply it
+            mock_users_db[uid]["role"] = role
+            if roles_version == expected_version and version == expected_version + 1:
+                # No other worker wrote in between, so the local cache is now exactly this version
+                roles_version = version
 
 async def verify_mock_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
     """Mock token verification - just return user info based on token"""
@@ -79,6 +107,7 @@ async def verify_mock_token(credentials: Optional[HTTPAuthorizationCredentials]
 async def get_current_user(token_data: dict = Depends(verify_mock_token)) -> UserWithRole:
     """Get current authenticated user with role information"""
     uid = token_data["uid"]
+    await sync_user_roles()
     user_role = get_user_role(uid)
     
     return UserWithRole(
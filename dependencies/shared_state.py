@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, Optional, Tuple
+
+# Path of the on-disk store shared by all workers; unset means single-process mode
+SHARED_STATE_PATH_ENV = "SHARED_STATE_PATH"
+
+# How many ids a worker leases at once - one write per block instead of per item
+ID_BLOCK_SIZE = 100
+
+# Seconds to wait for another worker's write lock. Writes run in the thread pool, but
+# version checks run on the event loop, so this must stay well below a request timeout
+BUSY_TIMEOUT = 5
+
+class SharedState:
+    """SQLite-backed state shared by the worker processes of one server
+
+    Each thread gets its own connection, so event loop reads never queue behind
+    a write waiting on another worker in the thread pool.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._local = threading.local()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (collection, key))"
+        )
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read_counter(self, name: str) -> int:
+        row = self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _add_to_counter(self, name: str, amount: int) -> int:
+        value = self._read_counter(name) + amount
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value)
+        )
+        return value
+
+    def _write(self, statement: str, params: tuple, collection: str) -> Optional[int]:
+        """Run a write and bump the collection version in one transaction
+
+        Returns None, leaving the version alone, if the write changed no rows.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._conn.execute(statement, params).rowcount == 0:
+                self._conn.execute("ROLLBACK")
+                return None
+            version = self._add_to_counter(f"version:{collection}", 1)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return version
+
+    def version(self, collection: str) -> int:
+        """Get the current version of a collection - it changes on every write"""
+        return self._read_counter(f"version:{collection}")
+
+    def snapshot(self, collection: str) -> Tuple[int, Dict[str, Any]]:
+        """Get a collection's version and records as of the same point in time"""
+        self._conn.execute("BEGIN")
+        try:
+            version = self._read_counter(f"version:{collection}")
+            rows = self._conn.execute(
+                "SELECT key, value FROM records WHERE collection = ?", (collection,)
+            ).fetchall()
+        finally:
+            self._conn.execute("COMMIT")
+        return version, {key: json.loads(value) for key, value in rows}
+
+    def save(self, collection: str, key: str, value: Any) -> int:
+        """Insert or replace a record, returning the new collection version"""
+        return self._write(
+            "INSERT INTO records (collection, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(collection, key) DO UPDATE SET value = excluded.value",
+            (collection, key, json.dumps(value)),
+            collection
+        )
+
+    def update(
+        self, collection: str, key: str, changes: Dict[str, Any], default: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Merge changes into a record in one transaction
+
+        Dict values are merged one level deep rather than replaced. A missing
+        record starts from default; without one, None is returned instead of the
+        new collection version and merged record.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT value FROM records WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+            if row is None and default is None:
+                self._conn.execute("ROLLBACK")
+                return None
+            value = json.loads(row[0]) if row is not None else dict(default)
+            for field, change in changes.items():
+                if isinstance(change, dict) and isinstance(value.get(field), dict):
+                    value[field] = {**value[field], **change}
+                else:
+                    value[field] = change
+            self._conn.execute(
+                "INSERT INTO records (collection, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(collection, key) DO UPDATE SET value = excluded.value",
+                (collection, key, json.dumps(value))
+            )
+            version = self._add_to_counter(f"version:{collection}", 1)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return version, value
+
+    def delete(self, collection: str, key: str) -> Optional[int]:
+        """Delete a record, returning the new collection version (None if it was already gone)"""
+        return self._write(
+            "DELETE FROM records WHERE collection = ? AND key = ?", (collection, key), collection
+        )
+
+    def lease_ids(self, name: str, count: int) -> range:
+        """Lease a block of ids no other worker will ever be handed"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            end = self._add_to_counter(f"ids:{name}", count)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return range(end - count + 1, end + 1)
+
+class IdAllocator:
+    """Hand out collision-free ids from blocks leased from the shared state"""
+
+    def __init__(self, state: SharedState, name: str, block_size: int = ID_BLOCK_SIZE):
+        self._state = state
+        self._name = name
+        self._block_size = block_size
+        self._block = range(0)
+        self._lock = asyncio.Lock()
+
+    async def next(self) -> int:
+        async with self._lock:
+            if not self._block:
+                self._block = await run_in_threadpool(self._state.lease_ids, self._name, self._block_size)
+            item_id = self._block[0]
+            self._block = self._block[1:]
+            return item_id
+
+def open_shared_state() -> Optional[SharedState]:
+    """Open the shared state configured for this process, if any"""
+    path = os.environ.get(SHARED_STATE_PATH_ENV)
+    return SharedState(path) if path else None
+
+# Shared state for multi-worker mode (None when running a single process)
+shared_state = open_shared_state()
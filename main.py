@@ -47,5 +47,21 @@ async def health_check():
 
 if __name__ == "__main__":
     import os
+    import shutil
+    import tempfile
+    from dependencies.shared_state import SHARED_STATE_PATH_ENV
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Workers share state through an on-disk store - start each run from a fresh one
+        state_dir = None
+        if SHARED_STATE_PATH_ENV not in os.environ:
+            state_dir = tempfile.mkdtemp()
+            os.environ[SHARED_STATE_PATH_ENV] = os.path.join(state_dir, "shared_state.db")
+        try:
+            uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+        finally:
+            if state_dir is not None:
+                shutil.rmtree(state_dir, ignore_errors=True)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -45,7 +45,7 @@ async def update_user_role(
     current_user: UserWithRole = Depends(require_manage_users)
 ):
     """Update user role (Admin and users with manage_users permission)"""
-    set_user_role(role_update.uid, role_update.role)
+    await set_user_role(role_update.uid, role_update.role)
     
     return UserRoleResponse(
         uid=role_update.uid,
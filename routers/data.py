@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Hashable, List, Optional
 from dependencies.mock_auth import get_current_user, require_view_all_data, require_edit_all_data
+from dependencies.shared_state import IdAllocator, shared_state
+from dependencies.single_flight import SingleFlight
 from models.roles import UserWithRole, UserRole, can_access_user_data, can_edit_user_data
 
-router = APIRouter(prefix="/data", tags=["data-management"])
-
 # Data models
 class DataItem(BaseModel):
     id: int
@@ -13,7 +15,7 @@ class DataItem(BaseModel):
     content: str
     owner_id: str
     created_at: str
-    updated_at: str = None
+    updated_at: Optional[str] = None
 
 class CreateDataItem(BaseModel):
     title: str
@@ -23,20 +25,122 @@ class UpdateDataItem(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
 
+# Validates coalesced list responses, which bypass the route's response_model
+data_item_list = TypeAdapter(List[DataItem])
+
 # In-memory storage (replace with database)
 data_items_db = []
 next_id = 1
 
+# Bumped on every write so a read never joins a computation started before it;
+# in multi-worker mode this is the shared version data_items_db was loaded at
+data_version = 0
+
+# Workers lease blocks of ids from the shared state so they never collide
+data_ids = IdAllocator(shared_state, "data_items") if shared_state is not None else None
+
+async def allocate_data_id() -> int:
+    """Get an id for a new data item"""
+    global next_id
+    if data_ids is not None:
+        return await data_ids.next()
+    item_id = next_id
+    next_id += 1
+    return item_id
+
+def apply_data_write(item: dict, deleted: bool = False):
+    """Apply a write to the local cache, replacing any cached copy of the item"""
+    for index, cached_item in enumerate(data_items_db):
+        if cached_item["id"] == item["id"]:
+            if deleted:
+                data_items_db.pop(index)
+            else:
+                data_items_db[index] = item  # Copy-on-write - never mutate cached items
+            return
+    if not deleted:
+        data_items_db.append(item)
+
+async def record_data_write(item: dict, deleted: bool = False):
+    """Apply a write locally and publish it to other workers, or bump the local version"""
+    global data_version
+    apply_data_write(item, deleted)
+    if shared_state is None:
+        data_version += 1
+        return
+    expected_version = data_version
+    if deleted:
+        version = await run_in_threadpool(shared_state.delete, "data_items", str(item["id"]))
+        if version is None:
+            # Another worker deleted it first - its write bumped the version, so the next sync reloads
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Data item not found"
+            )
+    else:
+        version = await run_in_threadpool(shared_state.save, "data_items", str(item["id"]), item)
+    settle_data_write(item, version, expected_version, deleted)
+
+def settle_data_write(item: dict, version: int, expected_version: int, deleted: bool = False):
+    """Reconcile the local cache with a shared write that has just committed
+
+    expected_version is data_version from before the write was awaited. A sync may
+    have run meanwhile and loaded a snapshot taken before the write committed, so
+    the write is re-applied unless the cache was loaded at or after its version.
+    """
+    global data_version
+    if data_version >= version:
+        return  # The cache was reloaded from a snapshot that already includes the write
+    apply_data_write(item, deleted)
+    if data_version == expected_version and version == expected_version + 1:
+        # No other write landed in between, so the cache is now exactly this version
+        data_version = version
+
+async def sync_data_items():
+    """Reload data items when another worker has changed them"""
+    global data_version
+    if shared_state is None or shared_state.version("data_items") == data_version:
+        return
+    version, items = await run_in_threadpool(shared_state.snapshot, "data_items")
+    if version > data_version:  # A concurrent request may have loaded a newer one meanwhile
+        data_items_db[:] = sorted(items.values(), key=lambda item: item["id"])
+        data_version = version
+
+router = APIRouter(prefix="/data", tags=["data-management"], dependencies=[Depends(sync_data_items)])
+
+# Identical concurrent reads share one scan and one encoded response body
+read_flights = SingleFlight()
+
+def get_data_scope(current_user: UserWithRole) -> Hashable:
+    """Get the visibility scope of a user - readers in the same scope see the same data"""
+    if current_user.role in [UserRole.ADMIN, UserRole.STAKEHOLDER, UserRole.INTERNAL]:
+        # Admin, Stakeholder, and Internal users can see all data
+        return (current_user.role.value, None)
+    # Normal users can only see their own data
+    return (current_user.role.value, current_user.uid)
+
+def get_visible_items(scope: Hashable) -> list:
+    """Get the data items visible within a scope"""
+    _, owner_id = scope
+    # Items are never mutated in place (updates are copy-on-write), so copying the
+    # list is a consistent snapshot even while writes land on the event loop
+    items = list(data_items_db)
+    if owner_id is None:
+        return items
+    return [item for item in items if item["owner_id"] == owner_id]
+
+async def coalesced_json_response(key: Hashable, compute: Callable[[], bytes]) -> Response:
+    """Compute an encoded JSON body once for all concurrent requests with the same key"""
+    body = await read_flights.do((data_version,) + key, lambda: run_in_threadpool(compute))
+    return Response(content=body, media_type="application/json")
+
 @router.get("/", response_model=List[DataItem])
 async def get_user_data(current_user: UserWithRole = Depends(get_current_user)):
     """Get data items - all users' data for admin/stakeholder, own data for others"""
-    if current_user.role in [UserRole.ADMIN, UserRole.STAKEHOLDER, UserRole.INTERNAL]:
-        # Admin, Stakeholder, and Internal users can see all data
-        return data_items_db
-    else:
-        # Normal users can only see their own data
-        user_data = [item for item in data_items_db if item["owner_id"] == current_user.uid]
-        return user_data
+    scope = get_data_scope(current_user)
+    
+    def list_items():
+        return data_item_list.dump_json(data_item_list.validate_python(get_visible_items(scope)))
+    return await coalesced_json_response(("list", scope), list_items)
 
 @router.post("/", response_model=DataItem)
 async def create_data_item(
@@ -44,19 +148,17 @@ async def create_data_item(
     current_user: UserWithRole = Depends(get_current_user)
 ):
     """Create a new data item for the current user"""
-    global next_id
     from datetime import datetime
     
     new_item = {
-        "id": next_id,
+        "id": await allocate_data_id(),
         "title": data.title,
         "content": data.content,
         "owner_id": current_user.uid,
         "created_at": datetime.now().isoformat(),
         "updated_at": None
     }
-    data_items_db.append(new_item)
-    next_id += 1
+    await record_data_write(new_item)
     return new_item
 
 @router.get("/{item_id}", response_model=DataItem)
@@ -102,15 +204,30 @@ async def update_data_item(
             detail="Access denied to edit this data item"
         )
     
-    item_index = data_items_db.index(item)
     from datetime import datetime
+    changes = {"updated_at": datetime.now().isoformat()}
     if data.title is not None:
-        data_items_db[item_index]["title"] = data.title
+        changes["title"] = data.title
     if data.content is not None:
-        data_items_db[item_index]["content"] = data.content
+        changes["content"] = data.content
     
-    data_items_db[item_index]["updated_at"] = datetime.now().isoformat()
-    return data_items_db[item_index]
+    if shared_state is None:
+        # Copy-on-write - reads running off the event loop must never see a half-applied update
+        updated_item = {**item, **changes}
+        await record_data_write(updated_item)
+    else:
+        # Apply the changes to the shared row, which another worker may have changed or deleted
+        expected_version = data_version
+        result = await run_in_threadpool(shared_state.update, "data_items", str(item_id), changes)
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Data item not found"
+            )
+        version, updated_item = result
+        settle_data_write(updated_item, version, expected_version)
+    
+    return updated_item
 
 @router.delete("/{item_id}")
 async def delete_data_item(
@@ -132,9 +249,8 @@ async def delete_data_item(
             detail="Access denied to delete this data item"
         )
     
-    item_index = data_items_db.index(item)
-    deleted_item = data_items_db.pop(item_index)
-    return {"message": f"Data item '{deleted_item['title']}' deleted successfully"}
+    await record_data_write(item, deleted=True)
+    return {"message": f"Data item '{item['title']}' deleted successfully"}
 
 @router.get("/search/{query}")
 async def search_data_items(
@@ -142,15 +258,14 @@ async def search_data_items(
     current_user: UserWithRole = Depends(get_current_user)
 ):
     """Search data items by title or content (role-based access)"""
-    if current_user.role in [UserRole.ADMIN, UserRole.STAKEHOLDER, UserRole.INTERNAL]:
-        # Admin, Stakeholder, and Internal users can search all data
-        searchable_items = data_items_db
-    else:
-        # Normal users can only search their own data
-        searchable_items = [item for item in data_items_db if item["owner_id"] == current_user.uid]
+    scope = get_data_scope(current_user)
     
-    matching_items = [
-        item for item in searchable_items 
-        if query.lower() in item["title"].lower() or query.lower() in item["content"].lower()
-    ]
-    return matching_items
+    def search():
+        searchable_items = get_visible_items(scope)
+        matching_items = [
+            item for item in searchable_items 
+            if query.lower() in item["title"].lower() or query.lower() in item["content"].lower()
+        ]
+        # Cached items only hold JSON types, so they can be rendered without jsonable_encoder
+        return JSONResponse(matching_items).body
+    return await coalesced_json_response(("search", query, scope), search)
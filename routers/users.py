@@ -2,10 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from typing import List, Optional
 from dependencies.mock_auth import get_current_user, require_view_all_users
+from dependencies.shared_state import shared_state
+from starlette.concurrency import run_in_threadpool
 from models.roles import UserWithRole, UserRole
 
-router = APIRouter(prefix="/users", tags=["user-management"])
-
 # User-specific models
 class UserProfile(BaseModel):
     uid: str
@@ -21,6 +21,22 @@ class UpdateProfile(BaseModel):
 # In-memory storage for user profiles (replace with database)
 user_profiles_db = {}
 
+# Version of the shared profiles reflected in user_profiles_db (multi-worker mode)
+profiles_version = 0
+
+async def sync_user_profiles():
+    """Reload user profiles when another worker has changed them"""
+    global profiles_version
+    if shared_state is None or shared_state.version("user_profiles") == profiles_version:
+        return
+    version, profiles = await run_in_threadpool(shared_state.snapshot, "user_profiles")
+    if version > profiles_version:  # A concurrent request may have loaded a newer one meanwhile
+        user_profiles_db.clear()
+        user_profiles_db.update(profiles)
+        profiles_version = version
+
+router = APIRouter(prefix="/users", tags=["user-management"], dependencies=[Depends(sync_user_profiles)])
+
 @router.get("/profile", response_model=UserProfile)
 async def get_user_profile(current_user: UserWithRole = Depends(get_current_user)):
     """Get current user's profile"""
@@ -39,13 +55,36 @@ async def update_user_profile(
     current_user: UserWithRole = Depends(get_current_user)
 ):
     """Update current user's profile"""
-    current_profile = user_profiles_db.get(current_user.uid, {
+    global profiles_version
+    default_profile = {
         "uid": current_user.uid,
         "email": current_user.email,
         "display_name": current_user.display_name,
         "email_verified": current_user.email_verified,
         "preferences": {}
-    })
+    }
+    
+    if shared_state is not None:
+        changes = {}
+        if profile_update.display_name is not None:
+            changes["display_name"] = profile_update.display_name
+        if profile_update.preferences is not None:
+            changes["preferences"] = profile_update.preferences
+        
+        # Merge into the shared profile, which another worker may be updating too
+        expected_version = profiles_version
+        version, current_profile = await run_in_threadpool(
+            shared_state.update, "user_profiles", current_user.uid, changes, default_profile
+        )
+        if profiles_version < version:
+            # A sync meanwhile may have loaded a snapshot from before this change - re-apply it
+            user_profiles_db[current_user.uid] = current_profile
+            if profiles_version == expected_version and version == expected_version + 1:
+                # No other worker wrote in between, so the local cache is now exactly this version
+                profiles_version = version
+        return current_profile
+    
+    current_profile = user_profiles_db.get(current_user.uid, default_profile)
     
     if profile_update.display_name is not None:
         current_profile["display_name"] = profile_update.display_name